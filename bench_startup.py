@@ -0,0 +1,66 @@
+# bench_startup.py (cold start benchmark)
+"""Measure how long a fresh worker takes to import the app, build it and render a page.
+
+Each run starts a new interpreter, like a prefork server spawning a worker:
+
+    python bench_startup.py --runs 20 --preload --budget 300
+
+Run `flask --app app compile-templates` first to measure with precompiled templates.
+With `gunicorn --preload` the import happens once in the master, so forked
+workers only pay the create_app and first_template phases; --preload gates
+the budget on those ("worker") instead of the full cold start ("total").
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+WORKER = """
+import json, os, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+# Use the configured database driver when DATABASE_URL is set
+flask_app = app.create_app(None if os.environ.get('DATABASE_URL') else {'SQLALCHEMY_DATABASE_URI': 'sqlite://'})
+created = time.perf_counter()
+with flask_app.test_request_context('/'):
+    flask_app.jinja_env.get_template('manga_list.html')
+rendered = time.perf_counter()
+print(json.dumps({
+    'import': (imported - start) * 1000,
+    'create_app': (created - imported) * 1000,
+    'first_template': (rendered - created) * 1000,
+    'worker': (rendered - imported) * 1000,
+    'total': (rendered - start) * 1000,
+}))
+"""
+
+def run_once():
+    result = subprocess.run([sys.executable, '-c', WORKER], capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)), check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--budget', type=float, default=300, help='max median in milliseconds')
+    parser.add_argument('--preload', action='store_true',
+                        help='gate on what a worker forked after the import pays (gunicorn --preload)')
+    args = parser.parse_args()
+
+    samples = [run_once() for _ in range(args.runs)]
+    for phase in ('import', 'create_app', 'first_template', 'worker', 'total'):
+        values = sorted(sample[phase] for sample in samples)
+        p95 = values[min(len(values) - 1, int(len(values) * 0.95))]
+        print(f"{phase:>15}: median {statistics.median(values):7.1f} ms   p95 {p95:7.1f} ms")
+
+    gated = 'worker' if args.preload else 'total'
+    median = statistics.median(sample[gated] for sample in samples)
+    if median > args.budget:
+        print(f"Median {gated} time {median:.1f} ms exceeds the {args.budget:.0f} ms budget")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,281 @@
+// templates/service_worker.js
+// Offline reading: chapter bundles are downloaded resumably, page images are
+// served as slices of the cached bundle and progress saves are queued while offline.
+const CACHE_NAME = 'manga-offline-v1';
+const INDEX_URL = '/__offline-index__';
+const PROGRESS_PATH = /^\/chapter\/\d+\/progress$/;
+const RETRY_LIMIT = 5;
+
+self.addEventListener('install', function() {
+    self.skipWaiting();
+});
+
+self.addEventListener('activate', function(event) {
+    event.waitUntil(caches.keys().then(function(names) {
+        return Promise.all(names.filter(name => name !== CACHE_NAME).map(name => caches.delete(name)));
+    }).then(loadIndex).then(() => self.clients.claim()));
+});
+
+// Page image URL -> {bundle, offset, length, type}
+async function readIndex(cache) {
+    const response = await cache.match(INDEX_URL);
+    return response ? response.json() : {};
+}
+
+// In-memory copy of the index, so the fetch handler can tell without any
+// cache reads which image requests a saved bundle can answer
+let pageIndex = null;
+let indexLoading = null;
+
+function loadIndex() {
+    if (!indexLoading) {
+        indexLoading = caches.open(CACHE_NAME).then(readIndex).then(function(index) {
+            pageIndex = index;
+            return index;
+        }, function() {
+            indexLoading = null;
+            return {};
+        });
+    }
+    return indexLoading;
+}
+
+function partialUrl(bundleUrl) {
+    return bundleUrl + '&partial=1';
+}
+
+async function writeIndex(cache, index) {
+    await cache.put(INDEX_URL, new Response(JSON.stringify(index), {
+        headers: { 'Content-Type': 'application/json' }
+    }));
+}
+
+async function notify(message) {
+    const clients = await self.clients.matchAll({ type: 'window' });
+    clients.forEach(client => client.postMessage(message));
+}
+
+// Download a bundle with Range/If-Range, keeping the partial blob in the cache
+// so an interrupted download resumes where it stopped.
+async function downloadBundle(cache, manifest) {
+    const partialKey = partialUrl(manifest.bundle_url);
+    const complete = await cache.match(manifest.bundle_url);
+    if (complete && complete.headers.get('ETag') === manifest.etag) {
+        return;
+    }
+
+    let parts = [];
+    let received = 0;
+    const partial = await cache.match(partialKey);
+    if (partial && partial.headers.get('ETag') === manifest.etag) {
+        const blob = await partial.blob();
+        parts.push(blob);
+        received = blob.size;
+    }
+
+    let failures = 0;
+    while (received < manifest.size) {
+        const headers = {};
+        if (received > 0) {
+            headers['Range'] = `bytes=${received}-`;
+            headers['If-Range'] = manifest.etag;
+        }
+
+        try {
+            const response = await fetch(manifest.bundle_url, { headers: headers, credentials: 'same-origin' });
+            if (response.status === 200) {
+                // Bundle changed or the range was ignored: start over
+                parts = [];
+                received = 0;
+            } else if (response.status !== 206) {
+                throw new Error(`Bundle download failed with ${response.status}`);
+            }
+
+            const reader = response.body.getReader();
+            for (;;) {
+                const { done, value } = await reader.read();
+                if (done) {
+                    break;
+                }
+                parts.push(value);
+                received += value.byteLength;
+                notify({ type: 'cache-progress', received: received, size: manifest.size });
+            }
+        } catch (error) {
+            await cache.put(partialKey, new Response(new Blob(parts), { headers: { 'ETag': manifest.etag } }));
+            if (++failures > RETRY_LIMIT) {
+                throw error;
+            }
+            await new Promise(resolve => setTimeout(resolve, 1000 * failures));
+        }
+    }
+
+    await cache.put(manifest.bundle_url, new Response(new Blob(parts), {
+        headers: { 'ETag': manifest.etag, 'Content-Type': 'application/zip' }
+    }));
+    await cache.delete(partialKey);
+}
+
+async function cacheChapter(manifestUrl) {
+    const cache = await caches.open(CACHE_NAME);
+    const response = await fetch(manifestUrl, { credentials: 'same-origin' });
+    if (!response.ok) {
+        throw new Error(`Manifest request failed with ${response.status}`);
+    }
+    const manifest = await response.json();
+
+    await downloadBundle(cache, manifest);
+
+    // A re-saved bundle replaces every entry that pointed into its old copy
+    const index = await loadIndex();
+    const previousBundles = new Set(Object.values(index).map(entry => entry.bundle));
+    for (const [url, entry] of Object.entries(index)) {
+        if (entry.bundle === manifest.bundle_url) {
+            delete index[url];
+        }
+    }
+    for (const chapter of manifest.chapters) {
+        for (const page of chapter.pages) {
+            index[page.url] = { bundle: manifest.bundle_url, offset: page.offset, length: page.length, type: page.type };
+        }
+        // Reader pages are fetched without counting as a read
+        const page = await fetch(chapter.reader_url, {
+            headers: { 'X-Offline-Prefetch': '1' },
+            credentials: 'same-origin'
+        });
+        if (page.ok) {
+            await cache.put(chapter.reader_url, page);
+        }
+    }
+    await writeIndex(cache, index);
+
+    // Bundles whose pages have all been re-saved elsewhere are dropped
+    const bundles = new Set(Object.values(index).map(entry => entry.bundle));
+    for (const bundle of previousBundles) {
+        if (!bundles.has(bundle)) {
+            await cache.delete(bundle);
+            await cache.delete(partialUrl(bundle));
+        }
+    }
+}
+
+async function serveFromBundle(request, entry) {
+    const cache = await caches.open(CACHE_NAME);
+    const bundle = await cache.match(entry.bundle);
+    if (bundle) {
+        const blob = await bundle.blob();
+        return new Response(blob.slice(entry.offset, entry.offset + entry.length, entry.type), {
+            headers: { 'Content-Type': entry.type }
+        });
+    }
+    return fetch(request);
+}
+
+async function networkFirst(request) {
+    try {
+        return await fetch(request);
+    } catch (error) {
+        const cached = await caches.match(request, { ignoreSearch: true });
+        if (cached) {
+            return cached;
+        }
+        throw error;
+    }
+}
+
+// Progress saves made offline are kept in IndexedDB and replayed later
+function openQueue() {
+    return new Promise(function(resolve, reject) {
+        const open = indexedDB.open('manga-offline', 1);
+        open.onupgradeneeded = () => open.result.createObjectStore('progress', { keyPath: 'url' });
+        open.onsuccess = () => resolve(open.result);
+        open.onerror = () => reject(open.error);
+    });
+}
+
+function queueRequest(db, mode, action) {
+    return new Promise(function(resolve, reject) {
+        const tx = db.transaction('progress', mode);
+        const result = action(tx.objectStore('progress'));
+        tx.oncomplete = () => resolve(result.result);
+        tx.onerror = () => reject(tx.error);
+    });
+}
+
+async function saveProgress(request) {
+    const body = await request.clone().text();
+    try {
+        return await fetch(request);
+    } catch (error) {
+        // Only the latest position per chapter matters
+        const db = await openQueue();
+        await queueRequest(db, 'readwrite', store => store.put({ url: request.url, body: body }));
+        if (self.registration.sync) {
+            await self.registration.sync.register('replay-progress').catch(() => {});
+        }
+        return new Response(JSON.stringify({ queued: true }), {
+            status: 202,
+            headers: { 'Content-Type': 'application/json' }
+        });
+    }
+}
+
+async function replayProgress() {
+    const db = await openQueue();
+    const entries = await queueRequest(db, 'readonly', store => store.getAll());
+    for (const entry of entries) {
+        const response = await fetch(entry.url, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: entry.body,
+            credentials: 'same-origin'
+        });
+        if (response.ok || response.status < 500) {
+            await queueRequest(db, 'readwrite', store => store.delete(entry.url));
+        }
+    }
+}
+
+self.addEventListener('fetch', function(event) {
+    const request = event.request;
+    const url = new URL(request.url);
+    if (url.origin !== self.location.origin) {
+        return;
+    }
+
+    if (request.method === 'POST' && PROGRESS_PATH.test(url.pathname)) {
+        event.respondWith(saveProgress(request));
+    } else if (request.method !== 'GET') {
+        return;
+    } else if (request.destination === 'image') {
+        if (pageIndex === null) {
+            // The worker was restarted: wait for the index once, then only indexed pages are intercepted
+            event.respondWith(loadIndex().then(function(index) {
+                return index[url.pathname] ? serveFromBundle(request, index[url.pathname]) : fetch(request);
+            }));
+        } else if (pageIndex[url.pathname]) {
+            event.respondWith(serveFromBundle(request, pageIndex[url.pathname]));
+        }
+    } else if (request.mode === 'navigate') {
+        event.respondWith(networkFirst(request));
+    }
+});
+
+self.addEventListener('sync', function(event) {
+    if (event.tag === 'replay-progress') {
+        event.waitUntil(replayProgress());
+    }
+});
+
+self.addEventListener('message', function(event) {
+    if (event.data.type === 'cache-chapter') {
+        event.waitUntil(cacheChapter(event.data.url).then(
+            () => notify({ type: 'cache-complete' }),
+            error => notify({ type: 'cache-error', message: String(error) })
+        ));
+    } else if (event.data.type === 'replay-progress') {
+        event.waitUntil(replayProgress().catch(() => {}));
+    }
+});
+
+self.addEventListener('online', () => replayProgress().catch(() => {}));
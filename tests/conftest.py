@@ -0,0 +1,15 @@
+import pytest
+
+import app as manga_app
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = manga_app.create_app({
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'test.db'}",
+        'UPLOAD_FOLDER': str(tmp_path / 'uploads'),
+        'SESSION_BACKEND': 'memory',
+    })
+    with app.app_context():
+        manga_app.init_db()
+    return app
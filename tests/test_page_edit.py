@@ -0,0 +1,118 @@
+import json
+import os
+import struct
+import zlib
+from io import BytesIO
+
+import pytest
+
+import app as manga_app
+
+
+def png(width, height, color=0):
+    """A tiny valid PNG, distinguishable by ``color``."""
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+    rows = b''.join(b'\x00' + bytes([color]) * width for _ in range(height))
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 0, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(rows)) + chunk(b'IEND', b''))
+
+
+@pytest.fixture
+def admin(app):
+    client = app.test_client()
+    client.post('/login', data={'username': 'admin', 'password': 'admin123'})
+    return client
+
+
+@pytest.fixture
+def chapter_id(app):
+    with app.app_context():
+        chapter = manga_app.Chapter(manga_id=1, chapter_number=1.0, title='Pages')
+        manga_app.db.session.add(chapter)
+        manga_app.db.session.flush()
+        pages_dir = os.path.join(app.config['UPLOAD_FOLDER'], 'pages')
+        os.makedirs(pages_dir, exist_ok=True)
+        for number in range(1, 4):
+            with open(os.path.join(pages_dir, f'page{number}.png'), 'wb') as f:
+                f.write(png(2, 2, number))
+            manga_app.db.session.add(manga_app.Page(chapter_id=chapter.id, page_number=number,
+                                                    image_url=f'/static/uploads/pages/page{number}.png'))
+        manga_app.db.session.commit()
+        return chapter.id
+
+
+def page_files(app, chapter_id):
+    with app.app_context():
+        pages = manga_app.Page.query.filter_by(chapter_id=chapter_id).order_by(manga_app.Page.page_number)
+        return [(page.image_url, open(manga_app.upload_path(page.image_url), 'rb').read()) for page in pages]
+
+
+def test_same_named_uploads_in_one_edit_are_stored_separately(app, admin, chapter_id):
+    with app.app_context():
+        second_page = manga_app.Page.query.filter_by(chapter_id=chapter_id, page_number=2).one().id
+    operations = [
+        {'op': 'insert', 'file': 'new', 'at': 1},
+        {'op': 'replace', 'page_id': second_page, 'file': 'fix'},
+    ]
+    response = admin.post(f'/admin/chapter/{chapter_id}/pages/edit', data={
+        'operations': json.dumps(operations),
+        'new': (BytesIO(png(3, 3, 10)), 'x.png'),
+        'fix': (BytesIO(png(4, 4, 20)), 'x.png'),
+    }, content_type='multipart/form-data')
+    assert response.status_code == 200, response.get_data(as_text=True)
+
+    files = page_files(app, chapter_id)
+    assert len(files) == 4
+    urls = [url for url, _ in files]
+    assert len(set(urls)) == 4
+    assert files[0][1] == png(3, 3, 10)
+    assert files[2][1] == png(4, 4, 20)
+
+
+@pytest.fixture
+def archive_chapter_id(app, tmp_path):
+    with app.app_context():
+        chapter = manga_app.Chapter(manga_id=1, chapter_number=2.0, title='Archive')
+        manga_app.db.session.add(chapter)
+        manga_app.db.session.flush()
+        image_files = []
+        for number in range(1, 4):
+            image_files.append(str(tmp_path / f'source{number}.png'))
+            with open(image_files[-1], 'wb') as f:
+                f.write(png(2, 2, number))
+        manga_app.add_archive_pages(chapter.id, image_files)
+        manga_app.db.session.commit()
+        return chapter.id
+
+
+@pytest.mark.parametrize('operation', [
+    {'op': 'delete', 'from': 2},
+    {'op': 'move', 'page_id': 'first', 'to': 3},
+])
+def test_edited_archive_chapter_is_not_downloadable(app, admin, archive_chapter_id, operation):
+    download_url = f'/chapter/{archive_chapter_id}/download'
+    assert admin.get(download_url).status_code == 200
+    assert download_url in admin.get('/manga/1/chapter/2.0').get_data(as_text=True)
+
+    with app.app_context():
+        first_page = manga_app.Page.query.filter_by(chapter_id=archive_chapter_id, page_number=1).one().id
+    if operation.get('page_id') == 'first':
+        operation = {**operation, 'page_id': first_page}
+    response = admin.post(f'/admin/chapter/{archive_chapter_id}/pages/edit', json={'operations': [operation]})
+    assert response.status_code == 200, response.get_data(as_text=True)
+
+    assert admin.get(download_url).status_code == 404
+    assert download_url not in admin.get('/manga/1/chapter/2.0').get_data(as_text=True)
+
+
+def test_archive_download_is_private_and_revalidated(admin, archive_chapter_id):
+    response = admin.get(f'/chapter/{archive_chapter_id}/download')
+    assert response.status_code == 200
+    assert response.cache_control.private and response.cache_control.no_cache
+    assert not response.cache_control.public and response.cache_control.max_age is None
+    assert response.headers['ETag'] and response.headers['Last-Modified']
+
+    revalidated = admin.get(f'/chapter/{archive_chapter_id}/download',
+                            headers={'If-None-Match': response.headers['ETag']})
+    assert revalidated.status_code == 304
@@ -0,0 +1,38 @@
+import pytest
+
+import app as manga_app
+
+
+def stored_score(scope, item_id, metric='reads', window='popular'):
+    row = manga_app.db.session.get(manga_app.PopularityScore, (scope, item_id, metric, window))
+    return row.log_score if row else None
+
+
+def test_checkpoint_leaves_the_request_session_alone(app):
+    with app.app_context():
+        popularity = app.extensions['manga']['popularity']
+        manga_app.db.session.add(manga_app.Manga(title='Uncommitted', author='a'))
+        popularity.record_read(1, None)
+        popularity.checkpoint()
+        manga_app.db.session.rollback()
+
+        assert manga_app.Manga.query.filter_by(title='Uncommitted').first() is None
+        assert stored_score('manga', 1) is not None
+
+
+def test_checkpoint_adds_to_stored_scores(app):
+    with app.app_context():
+        popularity = app.extensions['manga']['popularity']
+        popularity.record_read(1, None)
+        popularity.checkpoint()
+        first = stored_score('manga', 1)
+        manga_app.db.session.rollback()
+
+        popularity.record_read(1, None)
+        popularity.checkpoint()
+        assert stored_score('manga', 1) == pytest.approx(manga_app._log2_add(first, first))
+
+        # Another worker picks the stored scores up on its first use
+        other = manga_app.PopularityTracker()
+        [(item_id, value)] = other.top('manga', 1)
+        assert item_id == 1 and value == pytest.approx(popularity.top('manga', 1)[0][1])
@@ -0,0 +1,32 @@
+import app as manga_app
+
+
+def today_stat():
+    return manga_app.db.session.get(manga_app.ReadingStat, (1, 1, manga_app.datetime.utcnow().date()))
+
+
+def test_views_increment_todays_stat(app):
+    with app.app_context():
+        manga_app.record_reading_stat(1, 1, new_chapter=True)
+        manga_app.record_reading_stat(1, 1, new_chapter=False)
+        manga_app.db.session.commit()
+        stat = today_stat()
+        assert (stat.reads, stat.chapters) == (2, 1)
+
+
+def test_concurrent_first_view_of_the_day_becomes_an_increment(app, monkeypatch):
+    with app.app_context():
+        session = manga_app.db.session()
+        begin_nested = session.begin_nested
+
+        def other_request_inserts_first():
+            # Stands in for a second tab whose row landed between our update and insert
+            session.connection().execute(manga_app.ReadingStat.__table__.insert().values(
+                user_id=1, manga_id=1, day=manga_app.datetime.utcnow().date(), reads=1, chapters=1))
+            return begin_nested()
+
+        monkeypatch.setattr(session, 'begin_nested', other_request_inserts_first)
+        manga_app.record_reading_stat(1, 1, new_chapter=True)
+        manga_app.db.session.commit()
+        stat = today_stat()
+        assert (stat.reads, stat.chapters) == (2, 2)
@@ -0,0 +1,17 @@
+import app as manga_app
+
+
+def test_same_named_single_page_uploads_are_stored_separately(app, tmp_path):
+    with app.app_context():
+        chapter = manga_app.Chapter(manga_id=1, chapter_number=1.0, title='Uploads')
+        manga_app.db.session.add(chapter)
+        manga_app.db.session.flush()
+        for content in (b'first', b'second'):
+            part_path = tmp_path / 'upload.part'
+            part_path.write_bytes(content)
+            manga_app.import_page_file(chapter.id, str(part_path), 'page.png')
+        manga_app.db.session.commit()
+
+        pages = manga_app.Page.query.filter_by(chapter_id=chapter.id).order_by(manga_app.Page.page_number).all()
+        assert pages[0].image_url != pages[1].image_url
+        assert [open(manga_app.upload_path(page.image_url), 'rb').read() for page in pages] == [b'first', b'second']